@@ -1,12 +1,17 @@
 import os
+import asyncio
+import atexit
 import logging
 import sqlite3
 import re
-import io
+import tempfile
 import json
+import threading
 from pathlib import Path
 
 # Third-party libraries
+import httpx
+from cachetools import LRUCache, TTLCache
 from dotenv import load_dotenv
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import (
@@ -18,11 +23,11 @@ from telegram.ext import (
     filters,
 )
 from telegram.error import TimedOut, TelegramError
+from telegram.request import HTTPXRequest
 
 # Google Drive Imports
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload
 
 # --- Configuration and Setup ---
 # UPDATED: Path for Railway persistent storage
@@ -42,88 +47,274 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
 )
 logger = logging.getLogger(__name__)
+# Third-party request logging is per-call noise at INFO; keep ours only.
+logging.getLogger("googleapiclient.discovery_cache").setLevel(logging.ERROR)
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 # --- State definitions for ConversationHandler ---
 SELECT_YEAR, GET_NAME, MAIN_MENU = range(3)
 
+# First-years are grouped into divisions, everyone else into branches; every
+# handler that words its replies accordingly looks the terms up here instead
+# of re-running the same year comparison.
+_GROUP_META = {
+    '1st_Year': ('DIVISION', 'Divisions', 'division', 'divisions'),
+    '_default': ('BRANCH', 'Branches', 'branch', 'branches'),
+}
+
+def _group_meta(year):
+    """Returns the (placeholder, plural, singular, command) wording for a year."""
+    return _GROUP_META.get(year, _GROUP_META['_default'])
+
+def _build_help_template(meta):
+    """Renders the static part of the /help text for one wording variant."""
+    group_name, group_name_plural, _, group_cmd = meta
+    return (
+        "👋 Hello {name}\\! Your current year is set to *{year_display}*\\.\n\n"
+        "*Available Commands:*\n"
+        f"• `/{group_cmd}` \\- Lists available {group_name_plural}\\.\n"
+        f"• `/subjects <{group_name}>` \\- Lists subjects for a {group_name.lower()}\\.\n"
+        f"• `/assignments <{group_name}> <SUBJECT>` \\- Lists available assignment numbers\\.\n"
+        f"• `/notes <{group_name}> <SUBJECT>` \\- Lists available note/unit numbers\\.\n"
+        f"• `/get <{group_name}> <SUBJECT> <NUMBER>` \\- Fetches an assignment file\\.\n"
+        f"• `/getnote <{group_name}> <SUBJECT> <NUMBER>` \\- Fetches a note/unit file\\.\n"
+        "• `/suggestion` \\- Send a suggestion or feedback\\.\n"
+        "• `/start` \\- To reset your year and name\\.\n"
+        "• `/cancel` \\- To end any active command\\."
+    )
+
+# The /help body only varies by year wording plus the user's name, so the
+# bulk of it is rendered once at import; name and year_display are the only
+# per-user placeholders left to format in.
+_HELP_TEMPLATE_BY_YEAR = {year: _build_help_template(meta) for year, meta in _GROUP_META.items()}
+
+# --- Precompiled Patterns ---
+# Compiled once at import; these run on every message / folder listing.
+_ASSIGN_RE = re.compile(r'assignment_(\d+)', re.IGNORECASE)
+_NOTE_RE = re.compile(r'(?:unit|note)_(\d+)', re.IGNORECASE)
+
 # --- Helper Function for Markdown ---
+# Translation table prefixing each MarkdownV2 special character with a
+# backslash; str.translate runs the whole pass in C with no per-match objects.
+_MD_TABLE = str.maketrans({c: '\\' + c for c in r'_*[]()~`>#+-=|{}.!'})
+
 def escape_markdown(text: str) -> str:
     """Escapes special characters for Telegram's MarkdownV2."""
     if not isinstance(text, str):
         text = str(text)
-    escape_chars = r'_*[]()~`>#+-=|{}.!'
-    return re.sub(f'([{re.escape(escape_chars)}])', r'\\\1', text)
+    return text.translate(_MD_TABLE)
 
 # --- Database Management (Caching with Year) ---
 DB_FILE = DATA_DIR / "file_cache.db"
 
+# One long-lived connection shared by all cache helpers; SQLite's page cache
+# stays warm instead of being rebuilt on every Telegram command. Writes are
+# serialized through _DB_LOCK, reads piggyback on WAL's reader concurrency.
+_DB_CONN = None
+_DB_LOCK = threading.Lock()
+
+# Constant SQL strings so sqlite3's per-connection statement cache reuses the
+# compiled statements instead of re-parsing the SQL on every call.
+_SQL_GET_ASSIGN = "SELECT telegram_file_id FROM assignment_cache WHERE year = ? AND group_name = ? AND subject = ? AND assignment_number = ?"
+_SQL_PUT_ASSIGN = (
+    "INSERT INTO assignment_cache (year, group_name, subject, assignment_number, telegram_file_id, drive_file_id, file_name) VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(year, group_name, subject, assignment_number) DO UPDATE SET telegram_file_id = excluded.telegram_file_id, "
+    "drive_file_id = COALESCE(excluded.drive_file_id, drive_file_id), file_name = COALESCE(excluded.file_name, file_name)"
+)
+_SQL_GET_ASSIGN_DRIVE = "SELECT drive_file_id, file_name FROM assignment_cache WHERE year = ? AND group_name = ? AND subject = ? AND assignment_number = ?"
+_SQL_GET_NOTE = "SELECT telegram_file_id FROM note_cache WHERE year = ? AND group_name = ? AND subject = ? AND note_number = ?"
+_SQL_PUT_NOTE = (
+    "INSERT INTO note_cache (year, group_name, subject, note_number, telegram_file_id, drive_file_id, file_name) VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(year, group_name, subject, note_number) DO UPDATE SET telegram_file_id = excluded.telegram_file_id, "
+    "drive_file_id = COALESCE(excluded.drive_file_id, drive_file_id), file_name = COALESCE(excluded.file_name, file_name)"
+)
+_SQL_GET_NOTE_DRIVE = "SELECT drive_file_id, file_name FROM note_cache WHERE year = ? AND group_name = ? AND subject = ? AND note_number = ?"
+
+def _connect():
+    """Returns the shared cache-DB connection, creating it on first use."""
+    global _DB_CONN
+    if _DB_CONN is None:
+        _DB_CONN = sqlite3.connect(f"file:{DB_FILE}?mode=rwc", uri=True, check_same_thread=False)
+        # These PRAGMAs are per-connection, so they must be applied here to
+        # reach the connection that actually serves queries; setup_database's
+        # short-lived connection only covers the WAL switch and the migration.
+        _DB_CONN.execute("PRAGMA synchronous=NORMAL")
+        _DB_CONN.execute("PRAGMA temp_store=MEMORY")
+        _DB_CONN.execute("PRAGMA cache_size=-64000")
+        _DB_CONN.execute("PRAGMA mmap_size=134217728")
+        # The shared writer is also the connection whose commits could
+        # otherwise trip an inline checkpoint.
+        _DB_CONN.execute("PRAGMA wal_autocheckpoint=10000")
+    return _DB_CONN
+
+@atexit.register
+def _close_db():
+    """Refreshes planner statistics and closes the shared connection on shutdown."""
+    if _DB_CONN is not None:
+        with _DB_LOCK:
+            _DB_CONN.execute("PRAGMA optimize")
+            _DB_CONN.close()
+
 def setup_database():
     """Initializes the SQLite database for caching."""
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS assignment_cache (
-            id INTEGER PRIMARY KEY, year TEXT, group_name TEXT, subject TEXT, assignment_number INTEGER,
-            telegram_file_id TEXT, UNIQUE(year, group_name, subject, assignment_number)
-        )""")
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS note_cache (
-            id INTEGER PRIMARY KEY, year TEXT, group_name TEXT, subject TEXT, note_number INTEGER,
-            telegram_file_id TEXT, UNIQUE(year, group_name, subject, note_number)
-        )""")
+    # WAL mode sticks to the DB file; the per-connection PRAGMAs below only
+    # tune this setup pass — _connect() applies them to the connection that
+    # serves the actual queries.
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # Raise the autocheckpoint threshold so checkpoints run from the periodic
+    # job instead of stalling a command mid-write.
+    cursor.execute("PRAGMA wal_autocheckpoint=10000")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.execute("PRAGMA mmap_size=134217728")
+    # Every lookup uses the full natural key, so the tables are clustered on it
+    # (WITHOUT ROWID): one B-tree holds both key and payload instead of a
+    # rowid heap plus a separate unique index.
+    for table, number_col in (("assignment_cache", "assignment_number"), ("note_cache", "note_number")):
+        _migrate_cache_table(cursor, table, number_col)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                year TEXT, group_name TEXT, subject TEXT, {number_col} INTEGER,
+                telegram_file_id TEXT, drive_file_id TEXT, file_name TEXT,
+                PRIMARY KEY (year, group_name, subject, {number_col})
+            ) WITHOUT ROWID""")
+    cursor.execute("ANALYZE")
     conn.commit()
     conn.close()
-    logger.info(f"Database initialized at: {DB_FILE}")
+    logger.info("Database initialized at: %s", DB_FILE)
+
+def _migrate_cache_table(cursor, table, number_col):
+    """One-time rebuild of a legacy rowid table into the clustered schema."""
+    row = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    if row is None or "WITHOUT ROWID" in row[0]:
+        return
+    columns = {r[1] for r in cursor.execute(f"PRAGMA table_info({table})")}
+    drive_cols = "drive_file_id, file_name" if "drive_file_id" in columns else "NULL, NULL"
+    cursor.execute(f"""
+        CREATE TABLE {table}_new (
+            year TEXT, group_name TEXT, subject TEXT, {number_col} INTEGER,
+            telegram_file_id TEXT, drive_file_id TEXT, file_name TEXT,
+            PRIMARY KEY (year, group_name, subject, {number_col})
+        ) WITHOUT ROWID""")
+    cursor.execute(f"""
+        INSERT OR IGNORE INTO {table}_new
+        SELECT year, group_name, subject, {number_col}, telegram_file_id, {drive_cols}
+        FROM {table}""")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    logger.info("Migrated %s to WITHOUT ROWID schema.", table)
+
+# In-process LRU layer over the SQLite cache: repeat requests for popular
+# files become O(1) dict lookups with no DB round-trip at all.
+_ASSIGN_ID_CACHE = LRUCache(maxsize=4096)
+_NOTE_ID_CACHE = LRUCache(maxsize=4096)
+# cachetools containers are not thread-safe, and these are shared by the
+# asyncio.to_thread workers that run the cache helpers concurrently.
+_LRU_LOCK = threading.Lock()
+
+def _cache_key(year, group_name, subject, number):
+    """Normalized lookup tuple shared by the LRU and SQLite layers."""
+    return (year, group_name.upper(), subject.upper(), number)
 
 def get_cached_assignment_id(year, group_name, subject, assignment_number):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT telegram_file_id FROM assignment_cache WHERE year = ? AND group_name = ? AND subject = ? AND assignment_number = ?",
-        (year, group_name.upper(), subject.upper(), assignment_number)
-    )
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] if result else None
-
-def cache_assignment_id(year, group_name, subject, assignment_number, file_id):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT OR REPLACE INTO assignment_cache (year, group_name, subject, assignment_number, telegram_file_id) VALUES (?, ?, ?, ?, ?)",
-        (year, group_name.upper(), subject.upper(), assignment_number, file_id)
-    )
-    conn.commit()
-    conn.close()
+    key = _cache_key(year, group_name, subject, assignment_number)
+    with _LRU_LOCK:
+        file_id = _ASSIGN_ID_CACHE.get(key)
+    if file_id:
+        return file_id
+    with _DB_LOCK:
+        result = _connect().execute(_SQL_GET_ASSIGN, key).fetchone()
+    if result:
+        with _LRU_LOCK:
+            _ASSIGN_ID_CACHE[key] = result[0]
+        return result[0]
+    return None
+
+def cache_assignment_id(year, group_name, subject, assignment_number, file_id, drive_file_id=None, file_name=None):
+    key = _cache_key(year, group_name, subject, assignment_number)
+    with _DB_LOCK:
+        conn = _connect()
+        conn.execute(_SQL_PUT_ASSIGN, (*key, file_id, drive_file_id, file_name))
+        conn.commit()
+    with _LRU_LOCK:
+        _ASSIGN_ID_CACHE[key] = file_id
+
+def get_cached_assignment_drive_id(year, group_name, subject, assignment_number):
+    """Returns (drive_file_id, file_name) if remembered, else None."""
+    with _DB_LOCK:
+        result = _connect().execute(
+            _SQL_GET_ASSIGN_DRIVE, _cache_key(year, group_name, subject, assignment_number)
+        ).fetchone()
+    return result if result and result[0] else None
+
+def evict_cached_assignment_id(year, group_name, subject, assignment_number):
+    """Drops a stale in-memory entry (e.g. after Telegram rejects the file id)."""
+    with _LRU_LOCK:
+        _ASSIGN_ID_CACHE.pop(_cache_key(year, group_name, subject, assignment_number), None)
 
 def get_cached_note_id(year, group_name, subject, note_number):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT telegram_file_id FROM note_cache WHERE year = ? AND group_name = ? AND subject = ? AND note_number = ?",
-        (year, group_name.upper(), subject.upper(), note_number)
-    )
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] if result else None
-
-def cache_note_id(year, group_name, subject, note_number, file_id):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT OR REPLACE INTO note_cache (year, group_name, subject, note_number, telegram_file_id) VALUES (?, ?, ?, ?, ?)",
-        (year, group_name.upper(), subject.upper(), note_number, file_id)
-    )
-    conn.commit()
-    conn.close()
+    key = _cache_key(year, group_name, subject, note_number)
+    with _LRU_LOCK:
+        file_id = _NOTE_ID_CACHE.get(key)
+    if file_id:
+        return file_id
+    with _DB_LOCK:
+        result = _connect().execute(_SQL_GET_NOTE, key).fetchone()
+    if result:
+        with _LRU_LOCK:
+            _NOTE_ID_CACHE[key] = result[0]
+        return result[0]
+    return None
+
+def cache_note_id(year, group_name, subject, note_number, file_id, drive_file_id=None, file_name=None):
+    key = _cache_key(year, group_name, subject, note_number)
+    with _DB_LOCK:
+        conn = _connect()
+        conn.execute(_SQL_PUT_NOTE, (*key, file_id, drive_file_id, file_name))
+        conn.commit()
+    with _LRU_LOCK:
+        _NOTE_ID_CACHE[key] = file_id
+
+def get_cached_note_drive_id(year, group_name, subject, note_number):
+    """Returns (drive_file_id, file_name) if remembered, else None."""
+    with _DB_LOCK:
+        result = _connect().execute(
+            _SQL_GET_NOTE_DRIVE, _cache_key(year, group_name, subject, note_number)
+        ).fetchone()
+    return result if result and result[0] else None
+
+def evict_cached_note_id(year, group_name, subject, note_number):
+    """Drops a stale in-memory entry (e.g. after Telegram rejects the file id)."""
+    with _LRU_LOCK:
+        _NOTE_ID_CACHE.pop(_cache_key(year, group_name, subject, note_number), None)
+
+# Async wrappers so handlers never block the event loop on SQLite I/O
+# (commits fsync the WAL); other updates keep progressing during a write.
+async def aget_cached_assignment_id(year, group_name, subject, assignment_number):
+    return await asyncio.to_thread(get_cached_assignment_id, year, group_name, subject, assignment_number)
+
+async def acache_assignment_id(year, group_name, subject, assignment_number, file_id, drive_file_id=None, file_name=None):
+    await asyncio.to_thread(cache_assignment_id, year, group_name, subject, assignment_number, file_id, drive_file_id, file_name)
+
+async def aget_cached_note_id(year, group_name, subject, note_number):
+    return await asyncio.to_thread(get_cached_note_id, year, group_name, subject, note_number)
+
+async def acache_note_id(year, group_name, subject, note_number, file_id, drive_file_id=None, file_name=None):
+    await asyncio.to_thread(cache_note_id, year, group_name, subject, note_number, file_id, drive_file_id, file_name)
 
 # --- Google Drive API Logic ---
 SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
 DRIVE_SERVICE = None
+DRIVE_CREDS = None
 
 def get_drive_service():
     """Initializes and returns the Google Drive API service from an environment variable."""
-    global DRIVE_SERVICE
+    global DRIVE_SERVICE, DRIVE_CREDS
     if DRIVE_SERVICE:
         return DRIVE_SERVICE
     try:
@@ -131,62 +322,283 @@ def get_drive_service():
         creds_json = json.loads(SERVICE_ACCOUNT_JSON)
         creds = service_account.Credentials.from_service_account_info(
             creds_json, scopes=SCOPES)
-        service = build("drive", "v3", credentials=creds)
+        service = build("drive", "v3", credentials=creds, cache_discovery=False, static_discovery=True)
         DRIVE_SERVICE = service
+        DRIVE_CREDS = creds
         logger.info("Google Drive service initialized successfully from variable.")
         return service
     except Exception as e:
-        logger.error(f"An error occurred initializing the Drive service: {e}")
+        logger.error("An error occurred initializing the Drive service: %s", e)
+        return None
+
+# Shared async HTTP client for direct Drive REST calls (media downloads);
+# keeps one keep-alive connection pool for the process.
+_HTTP_CLIENT = None
+
+def _get_http_client():
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        _HTTP_CLIENT = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+    return _HTTP_CLIENT
+
+def _drive_token():
+    """Returns a valid bearer token for Drive REST calls, refreshing if needed."""
+    if not get_drive_service():
         return None
+    if not DRIVE_CREDS.valid:
+        import google.auth.transport.requests
+        DRIVE_CREDS.refresh(google.auth.transport.requests.Request())
+    return DRIVE_CREDS.token
 
 # --- Google Drive Helper Functions ---
+# Folder ids essentially never change, so cache them and skip the Drive
+# round-trips that otherwise dominate every command's latency. TTLs keep the
+# bot self-correcting if the Drive tree is ever reorganized.
+_PATH_ID_CACHE = TTLCache(maxsize=1024, ttl=3600)
+_FOLDER_ID_CACHE = TTLCache(maxsize=2048, ttl=3600)
+# Folder listings do change when new material is uploaded, so they get a
+# much shorter TTL than the id caches.
+_FOLDER_LIST_CACHE = TTLCache(maxsize=512, ttl=300)
+# The prewarm thread writes these caches while the event loop reads and
+# writes them, and cachetools is not thread-safe; never held across an await.
+_DRIVE_CACHE_LOCK = threading.Lock()
+
+def evict_path_ids(path_parts):
+    """Forgets the cached folder ids for a path and all of its prefixes."""
+    path = tuple(path_parts)
+    with _DRIVE_CACHE_LOCK:
+        for i in range(len(path), 0, -1):
+            _PATH_ID_CACHE.pop(path[:i], None)
+
+def _list_all_files(service, **kwargs):
+    """Exhausts a files.list query, following nextPageToken when present."""
+    files = []
+    page_token = None
+    while True:
+        response = service.files().list(pageSize=1000, pageToken=page_token, **kwargs).execute()
+        files.extend(response.get('files', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return files
+
+async def _adrive_list(params):
+    """Runs one files.list against the Drive REST API without blocking the loop.
+
+    The googleapiclient stack is synchronous; calling it from handlers stalls
+    every other chat. Returns the parsed response dict, or None on failure.
+    """
+    token = await asyncio.to_thread(_drive_token)
+    if not token: return None
+    try:
+        response = await _get_http_client().get(
+            "https://www.googleapis.com/drive/v3/files",
+            params=params,
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as error:
+        logger.error("HTTP error listing Drive files: %s", error)
+        return None
+
+async def _alist_all_files(params):
+    """Async counterpart of _list_all_files; returns None on API failure."""
+    files = []
+    page_params = dict(params, pageSize=1000)
+    while True:
+        response = await _adrive_list(page_params)
+        if response is None:
+            return None
+        files.extend(response.get('files', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return files
+        page_params['pageToken'] = page_token
+
 async def find_item_id_in_parent(name, parent_id, is_folder=True):
-    service = get_drive_service()
-    if not service: return None
+    if is_folder:
+        with _DRIVE_CACHE_LOCK:
+            cached_id = _FOLDER_ID_CACHE.get((name, parent_id))
+        if cached_id:
+            return cached_id
     mime_type_query = "mimeType = 'application/vnd.google-apps.folder'" if is_folder else "mimeType != 'application/vnd.google-apps.folder'"
-    try:
-        query = f"name = '{name}' and '{parent_id}' in parents and trashed = false and {mime_type_query}"
-        response = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-        files = response.get('files', [])
-        return files[0].get('id') if files else None
-    except HttpError as error:
-        logger.error(f"API Error finding '{name}': {error}")
+    query = f"name = '{name}' and '{parent_id}' in parents and trashed = false and {mime_type_query}"
+    response = await _adrive_list({'q': query, 'spaces': 'drive', 'fields': 'files(id)', 'pageSize': 1})
+    if response is None:
         return None
+    files = response.get('files', [])
+    item_id = files[0].get('id') if files else None
+    if item_id and is_folder:
+        with _DRIVE_CACHE_LOCK:
+            _FOLDER_ID_CACHE[(name, parent_id)] = item_id
+    return item_id
 
 async def list_folders_in_parent(parent_id):
-    service = get_drive_service()
-    if not service: return []
-    try:
-        query = f"'{parent_id}' in parents and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
-        response = service.files().list(q=query, spaces='drive', fields='files(name)').execute()
-        return [item['name'] for item in response.get('files', [])]
-    except HttpError as error:
-        logger.error(f"API Error listing folders: {error}")
+    with _DRIVE_CACHE_LOCK:
+        cached = _FOLDER_LIST_CACHE.get(parent_id)
+    if cached is not None:
+        return cached
+    query = f"'{parent_id}' in parents and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
+    files = await _alist_all_files({'q': query, 'spaces': 'drive', 'fields': 'files(name), nextPageToken'})
+    if files is None:
         return []
-
-async def download_file_from_drive(file_id):
-    service = get_drive_service()
+    names = [item['name'] for item in files]
+    with _DRIVE_CACHE_LOCK:
+        _FOLDER_LIST_CACHE[parent_id] = names
+    return names
+
+# Cap concurrent Drive media transfers so a burst of /get commands shares
+# bandwidth sensibly instead of exhausting the pool or tripping rate limits.
+_DOWNLOAD_SEMAPHORE = asyncio.Semaphore(8)
+
+async def download_file_from_drive(file_id, size=None):
+    token = await asyncio.to_thread(_drive_token)
+    if not token: return None
+    # Small files stay in memory; anything past 4MB spills to disk so a burst
+    # of concurrent downloads of big PDFs doesn't balloon the process RSS.
+    fh = tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024)
+    if size:
+        # Pre-size the buffer so chunks are written in place rather than
+        # growing it with repeated reallocations (and forces an immediate
+        # rollover to disk when the file is known to be large).
+        fh.truncate(size)
     try:
-        request = service.files().get_media(fileId=file_id)
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while not done:
-            _, done = downloader.next_chunk()
+        client = _get_http_client()
+        async with _DOWNLOAD_SEMAPHORE:
+            async with client.stream(
+                "GET",
+                f"https://www.googleapis.com/drive/v3/files/{file_id}",
+                params={"alt": "media"},
+                headers={"Authorization": f"Bearer {token}"},
+            ) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(1 << 20):
+                    fh.write(chunk)
+        fh.truncate(fh.tell())  # trim if the size hint overshot
         fh.seek(0)
         return fh
-    except HttpError as error:
-        logger.error(f"API Error downloading file: {error}")
+    except httpx.HTTPError as error:
+        logger.error("HTTP error downloading file %s: %s", file_id, error)
+        fh.close()
+        return None
+
+async def _resolve_remaining_batched(path, start, current_id):
+    """Resolves path[start:] with one files.list call instead of one per level.
+
+    Fetches every folder matching any of the remaining names in a single
+    query, then walks the parent->child edges client-side. Returns None if
+    the listing misses a level (e.g. name collisions paged out), in which
+    case the caller falls back to the per-level walk.
+    """
+    name_clause = " or ".join(f"name = '{name}'" for name in set(path[start:]))
+    query = f"mimeType = 'application/vnd.google-apps.folder' and trashed = false and ({name_clause})"
+    files = await _alist_all_files({'q': query, 'spaces': 'drive', 'fields': 'files(id, name, parents), nextPageToken'})
+    if files is None:
         return None
+    children = {}
+    for item in files:
+        for parent in item.get('parents', []):
+            children.setdefault(parent, {})[item['name']] = item['id']
+    with _DRIVE_CACHE_LOCK:
+        for i in range(start, len(path)):
+            next_id = children.get(current_id, {}).get(path[i])
+            if not next_id:
+                return None
+            _FOLDER_ID_CACHE[(path[i], current_id)] = next_id
+            current_id = next_id
+            _PATH_ID_CACHE[path[:i + 1]] = current_id
+    return current_id
+
+def prewarm_paths(year):
+    """Pre-resolves a year's group and subject folders into the path caches.
+
+    Runs off the event loop right after a user picks their year, so their
+    later /subjects, /assignments and /get commands hit warm caches. The
+    per-group subject listings go out as one BatchHttpRequest instead of
+    one HTTP call per group.
+    """
+    service = get_drive_service()
+    if not service: return
+    folder_query = "mimeType = 'application/vnd.google-apps.folder' and trashed = false"
+    try:
+        response = service.files().list(
+            q=f"name = '{year}' and '{GOOGLE_DRIVE_ROOT_FOLDER_ID}' in parents and {folder_query}",
+            spaces='drive', fields='files(id)'
+        ).execute()
+        files = response.get('files', [])
+        if not files:
+            return
+        year_id = files[0]['id']
+        with _DRIVE_CACHE_LOCK:
+            _PATH_ID_CACHE[(year,)] = year_id
+            _FOLDER_ID_CACHE[(year, GOOGLE_DRIVE_ROOT_FOLDER_ID)] = year_id
+
+        group_ids = {
+            item['name']: item['id']
+            for item in _list_all_files(
+                service, q=f"'{year_id}' in parents and {folder_query}",
+                spaces='drive', fields='files(id, name), nextPageToken'
+            )
+        }
+        if not group_ids:
+            return
+        with _DRIVE_CACHE_LOCK:
+            for group_name, group_id in group_ids.items():
+                _PATH_ID_CACHE[(year, group_name)] = group_id
+                _FOLDER_ID_CACHE[(group_name, year_id)] = group_id
+
+        def _fill(request_id, response, exception):
+            if exception is not None:
+                return
+            group_id = group_ids[request_id]
+            with _DRIVE_CACHE_LOCK:
+                for subject in response.get('files', []):
+                    _PATH_ID_CACHE[(year, request_id, subject['name'])] = subject['id']
+                    _FOLDER_ID_CACHE[(subject['name'], group_id)] = subject['id']
+
+        batch = service.new_batch_http_request(callback=_fill)
+        for group_name, group_id in group_ids.items():
+            batch.add(
+                service.files().list(
+                    q=f"'{group_id}' in parents and {folder_query}",
+                    spaces='drive', fields='files(id, name)', pageSize=1000
+                ),
+                request_id=group_name,
+            )
+        batch.execute()
+    except HttpError as error:
+        logger.warning("Prewarming Drive path cache for '%s' failed: %s", year, error)
 
 async def resolve_path_to_id(path_parts):
-    current_id = GOOGLE_DRIVE_ROOT_FOLDER_ID
-    for part in path_parts:
-        next_id = await find_item_id_in_parent(part, current_id, is_folder=True)
+    path = tuple(path_parts)
+    with _DRIVE_CACHE_LOCK:
+        cached_id = _PATH_ID_CACHE.get(path)
+        if cached_id:
+            return cached_id
+        # Resume from the longest already-resolved prefix instead of the root.
+        current_id = GOOGLE_DRIVE_ROOT_FOLDER_ID
+        start = 0
+        for i in range(len(path) - 1, 0, -1):
+            prefix_id = _PATH_ID_CACHE.get(path[:i])
+            if prefix_id:
+                current_id, start = prefix_id, i
+                break
+    # Multi-level misses are resolved in one round-trip where possible.
+    if len(path) - start > 1:
+        resolved_id = await _resolve_remaining_batched(path, start, current_id)
+        if resolved_id:
+            return resolved_id
+    for i in range(start, len(path)):
+        next_id = await find_item_id_in_parent(path[i], current_id, is_folder=True)
         if not next_id:
-            logger.warning(f"Could not find folder part: '{part}' in path '{'/'.join(path_parts)}'")
+            logger.warning("Could not find folder part: '%s' in path '%s'", path[i], '/'.join(path_parts))
             return None
         current_id = next_id
+        with _DRIVE_CACHE_LOCK:
+            _PATH_ID_CACHE[path[:i + 1]] = current_id
     return current_id
 
 # --- Command Handlers ---
@@ -209,8 +621,11 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 async def select_year(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     year_display = update.message.text
     year_folder_name = year_display.replace(" ", "_")
-    context.user_data['year'] = year_folder_name
-    context.user_data['year_display'] = year_display
+    ud = context.user_data
+    ud['year'] = year_folder_name
+    ud['year_display'] = year_display
+    # Warm the Drive folder caches in the background while the user types.
+    context.application.create_task(asyncio.to_thread(prewarm_paths, year_folder_name))
     await update.message.reply_text(
         f"Great\\! You've selected *{escape_markdown(year_display)}*\\.\n\n"
         "Now, what's your name?",
@@ -233,39 +648,22 @@ async def get_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await check_user_setup(update, context): return
     
-    name = context.user_data.get('name', 'User')
-    year_display = context.user_data.get('year_display', 'N/A')
-    year = context.user_data.get('year')
-
-    if year == '1st_Year':
-        group_cmd = "divisions"
-        group_name = "DIVISION"
-        group_name_plural = "Divisions"
-    else:
-        group_cmd = "branches"
-        group_name = "BRANCH"
-        group_name_plural = "Branches"
-    
-    help_text = (
-        f"👋 Hello {escape_markdown(name)}\\! Your current year is set to *{escape_markdown(year_display)}*\\.\n\n"
-        "*Available Commands:*\n"
-        f"• `/{group_cmd}` \\- Lists available {group_name_plural}\\.\n"
-        f"• `/subjects <{group_name}>` \\- Lists subjects for a {group_name.lower()}\\.\n"
-        f"• `/assignments <{group_name}> <SUBJECT>` \\- Lists available assignment numbers\\.\n"
-        f"• `/notes <{group_name}> <SUBJECT>` \\- Lists available note/unit numbers\\.\n"
-        f"• `/get <{group_name}> <SUBJECT> <NUMBER>` \\- Fetches an assignment file\\.\n"
-        f"• `/getnote <{group_name}> <SUBJECT> <NUMBER>` \\- Fetches a note/unit file\\.\n"
-        "• `/suggestion` \\- Send a suggestion or feedback\\.\n"
-        "• `/start` \\- To reset your year and name\\.\n"
-        "• `/cancel` \\- To end any active command\\."
-    )
+    # Read user_data once; these fields are referenced several times below.
+    ud = context.user_data
+    name = ud.get('name', 'User')
+    year_display = ud.get('year_display', 'N/A')
+    year = ud.get('year')
+
+    template = _HELP_TEMPLATE_BY_YEAR.get(year, _HELP_TEMPLATE_BY_YEAR['_default'])
+    help_text = template.format(name=escape_markdown(name), year_display=escape_markdown(year_display))
     await update.message.reply_text(help_text, parse_mode='MarkdownV2')
 
 # UPDATED: This function now lists branches OR divisions
 async def list_branches_or_divisions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await check_user_setup(update, context): return
-    year = context.user_data['year']
-    year_display = context.user_data['year_display']
+    ud = context.user_data
+    year = ud['year']
+    year_display = ud['year_display']
     
     year_folder_id = await find_item_id_in_parent(year, GOOGLE_DRIVE_ROOT_FOLDER_ID)
     if not year_folder_id:
@@ -274,10 +672,7 @@ async def list_branches_or_divisions(update: Update, context: ContextTypes.DEFAU
 
     items = await list_folders_in_parent(year_folder_id)
     
-    if year == '1st_Year':
-        group_name_plural = "Divisions"
-    else:
-        group_name_plural = "Branches"
+    group_name_plural = _group_meta(year)[1]
 
     if not items:
         await update.message.reply_text(f"🤷 No {group_name_plural.lower()} found for `{escape_markdown(year_display)}`\\.", parse_mode='MarkdownV2')
@@ -291,15 +686,12 @@ async def list_branches_or_divisions(update: Update, context: ContextTypes.DEFAU
 async def list_subjects(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await check_user_setup(update, context): return
     
-    year = context.user_data['year']
-    year_display = context.user_data['year_display']
+    ud = context.user_data
+    year = ud['year']
+    year_display = ud['year_display']
 
-    if year == '1st_Year':
-        usage = "`/subjects <DIVISION>`"
-        group_name_singular = "division"
-    else:
-        usage = "`/subjects <BRANCH>`"
-        group_name_singular = "branch"
+    placeholder, _, group_name_singular, _ = _group_meta(year)
+    usage = f"`/subjects <{placeholder}>`"
 
     if not context.args:
         await update.message.reply_text(f"⚠️ Usage: {usage}")
@@ -327,10 +719,7 @@ async def list_assignments(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     year = context.user_data['year']
 
-    if year == '1st_Year':
-        usage = "`/assignments <DIVISION> <SUBJECT>`"
-    else:
-        usage = "`/assignments <BRANCH> <SUBJECT>`"
+    usage = f"`/assignments <{_group_meta(year)[0]}> <SUBJECT>`"
 
     if len(context.args) != 2:
         await update.message.reply_text(f"⚠️ Usage: {usage}")
@@ -343,17 +732,16 @@ async def list_assignments(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"❌ No `Assignments` folder found for `{escape_markdown(group_name)}/{escape_markdown(subject)}`\\.", parse_mode='MarkdownV2')
         return
 
-    service = get_drive_service()
-    query = f"'{assignments_folder_id}' in parents and trashed = false"
-    response = service.files().list(q=query, spaces='drive', fields='files(name)').execute()
-    files = response.get('files', [])
-    
-    assignment_numbers = {int(m.group(1)) for item in files if (m := re.search(r'assignment_(\d+)', item['name'], re.IGNORECASE))}
+    # Let Drive filter server-side; 'contains' matches name tokens case-insensitively.
+    query = f"'{assignments_folder_id}' in parents and trashed = false and name contains 'assignment'"
+    files = await _alist_all_files({'q': query, 'spaces': 'drive', 'fields': 'files(name), nextPageToken'}) or []
+
+    assignment_numbers = {int(m.group(1)) for item in files if (m := _ASSIGN_RE.search(item['name']))}
     if not assignment_numbers:
         await update.message.reply_text(f"🤷 No assignments found for `{escape_markdown(group_name)}/{escape_markdown(subject)}`\\.", parse_mode='MarkdownV2')
         return
 
-    number_list = "\n".join(f"• `Assignment {num}`" for num in sorted(list(assignment_numbers)))
+    number_list = "\n".join(f"• `Assignment {num}`" for num in sorted(assignment_numbers))
     message = f"📄 *Assignments for {escape_markdown(group_name)}/{escape_markdown(subject)}:*\n\n{number_list}"
     await update.message.reply_text(message, parse_mode='MarkdownV2')
 
@@ -363,10 +751,7 @@ async def get_assignment(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     year = context.user_data['year']
 
-    if year == '1st_Year':
-        usage = "`/get <DIVISION> <SUBJECT> <NUMBER>`"
-    else:
-        usage = "`/get <BRANCH> <SUBJECT> <NUMBER>`"
+    usage = f"`/get <{_group_meta(year)[0]}> <SUBJECT> <NUMBER>`"
 
     if len(context.args) != 3:
         await update.message.reply_text(f"⚠️ Usage: {usage}")
@@ -382,24 +767,35 @@ async def get_assignment(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     placeholder_message = await update.message.reply_text("⏳ Getting your file, please wait\\.\\.\\.", parse_mode='MarkdownV2')
 
-    cached_file_id = get_cached_assignment_id(year, group_name, subject, assignment_number)
+    cached_file_id = await aget_cached_assignment_id(year, group_name, subject, assignment_number)
     if cached_file_id:
         try:
             await context.bot.send_document(chat_id=update.effective_chat.id, document=cached_file_id)
             await placeholder_message.delete()
             return
         except TelegramError as e:
-            logger.warning(f"Failed to send cached file {cached_file_id}, re-downloading. Error: {e}")
+            logger.warning("Failed to send cached file %s, re-downloading. Error: %s", cached_file_id, e)
+            evict_cached_assignment_id(year, group_name, subject, assignment_number)
+
+    # A remembered Drive file id skips the folder resolution and listing.
+    cached_drive = await asyncio.to_thread(get_cached_assignment_drive_id, year, group_name, subject, assignment_number)
+    if cached_drive:
+        drive_file_id, file_name = cached_drive
+        file_content = await download_file_from_drive(drive_file_id)
+        if file_content:
+            sent_message = await context.bot.send_document(chat_id=update.effective_chat.id, document=file_content, filename=file_name)
+            await acache_assignment_id(year, group_name, subject, assignment_number, sent_message.document.file_id, drive_file_id, file_name)
+            await placeholder_message.delete()
+            return
 
     assignments_folder_id = await resolve_path_to_id([year, group_name, subject, "Assignments"])
     if not assignments_folder_id:
         await placeholder_message.edit_text("❌ Assignment folder not found\\.", parse_mode='MarkdownV2')
         return
 
-    service = get_drive_service()
     query = f"'{assignments_folder_id}' in parents and trashed = false and name ~* 'assignment_?{assignment_number}[^0-9]'"
-    response = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-    files = response.get('files', [])
+    response = await _adrive_list({'q': query, 'spaces': 'drive', 'fields': 'files(id, name, size)', 'pageSize': 1})
+    files = response.get('files', []) if response else []
     if not files:
         await placeholder_message.edit_text("❌ Assignment not found\\.", parse_mode='MarkdownV2')
         return
@@ -407,12 +803,13 @@ async def get_assignment(update: Update, context: ContextTypes.DEFAULT_TYPE):
     file_to_send = files[0]
     file_id, file_name = file_to_send['id'], file_to_send['name']
     
-    file_content = await download_file_from_drive(file_id)
+    file_content = await download_file_from_drive(file_id, size=int(file_to_send.get('size', 0)))
     if file_content:
         sent_message = await context.bot.send_document(chat_id=update.effective_chat.id, document=file_content, filename=file_name)
-        cache_assignment_id(year, group_name, subject, assignment_number, sent_message.document.file_id)
+        await acache_assignment_id(year, group_name, subject, assignment_number, sent_message.document.file_id, file_id, file_name)
         await placeholder_message.delete()
     else:
+        evict_path_ids([year, group_name, subject, "Assignments"])
         await placeholder_message.edit_text("⚠️ Error downloading the file from Google Drive\\.", parse_mode='MarkdownV2')
 
 # UPDATED: Logic is now dynamic
@@ -421,10 +818,7 @@ async def list_notes(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     year = context.user_data['year']
 
-    if year == '1st_Year':
-        usage = "`/notes <DIVISION> <SUBJECT>`"
-    else:
-        usage = "`/notes <BRANCH> <SUBJECT>`"
+    usage = f"`/notes <{_group_meta(year)[0]}> <SUBJECT>`"
 
     if len(context.args) != 2:
         await update.message.reply_text(f"⚠️ Usage: {usage}")
@@ -437,18 +831,16 @@ async def list_notes(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"❌ No `Notes` folder found for `{escape_markdown(group_name)}/{escape_markdown(subject)}`\\.", parse_mode='MarkdownV2')
         return
 
-    service = get_drive_service()
-    query = f"'{notes_folder_id}' in parents and trashed = false"
-    response = service.files().list(q=query, spaces='drive', fields='files(name)').execute()
-    files = response.get('files', [])
-    
-    note_numbers = {int(m.group(1)) for item in files if (m := re.search(r'(?:unit|note)_(\d+)', item['name'], re.IGNORECASE))}
+    query = f"'{notes_folder_id}' in parents and trashed = false and (name contains 'unit' or name contains 'note')"
+    files = await _alist_all_files({'q': query, 'spaces': 'drive', 'fields': 'files(name), nextPageToken'}) or []
+
+    note_numbers = {int(m.group(1)) for item in files if (m := _NOTE_RE.search(item['name']))}
     
     if not note_numbers:
         await update.message.reply_text(f"🤷 No notes found for `{escape_markdown(group_name)}/{escape_markdown(subject)}`\\.", parse_mode='MarkdownV2')
         return
         
-    note_list = "\n".join(f"• `Unit {num}`" for num in sorted(list(note_numbers)))
+    note_list = "\n".join(f"• `Unit {num}`" for num in sorted(note_numbers))
     message = f"📝 *Available Notes/Units for {escape_markdown(group_name)}/{escape_markdown(subject)}:*\n\n{note_list}"
     await update.message.reply_text(message, parse_mode='MarkdownV2')
 
@@ -458,10 +850,7 @@ async def get_note(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     year = context.user_data['year']
 
-    if year == '1st_Year':
-        usage = "`/getnote <DIVISION> <SUBJECT> <NUMBER>`"
-    else:
-        usage = "`/getnote <BRANCH> <SUBJECT> <NUMBER>`"
+    usage = f"`/getnote <{_group_meta(year)[0]}> <SUBJECT> <NUMBER>`"
     
     if len(context.args) != 3:
         await update.message.reply_text(f"⚠️ Usage: {usage}")
@@ -477,24 +866,35 @@ async def get_note(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     placeholder_message = await update.message.reply_text("⏳ Getting your file, please wait\\.\\.\\.", parse_mode='MarkdownV2')
 
-    cached_file_id = get_cached_note_id(year, group_name, subject, note_number)
+    cached_file_id = await aget_cached_note_id(year, group_name, subject, note_number)
     if cached_file_id:
         try:
             await context.bot.send_document(chat_id=update.effective_chat.id, document=cached_file_id)
             await placeholder_message.delete()
             return
         except TelegramError as e:
-            logger.warning(f"Failed to send cached file {cached_file_id}, re-downloading. Error: {e}")
+            logger.warning("Failed to send cached file %s, re-downloading. Error: %s", cached_file_id, e)
+            evict_cached_note_id(year, group_name, subject, note_number)
+
+    # A remembered Drive file id skips the folder resolution and listing.
+    cached_drive = await asyncio.to_thread(get_cached_note_drive_id, year, group_name, subject, note_number)
+    if cached_drive:
+        drive_file_id, file_name = cached_drive
+        file_content = await download_file_from_drive(drive_file_id)
+        if file_content:
+            sent_message = await context.bot.send_document(chat_id=update.effective_chat.id, document=file_content, filename=file_name)
+            await acache_note_id(year, group_name, subject, note_number, sent_message.document.file_id, drive_file_id, file_name)
+            await placeholder_message.delete()
+            return
 
     notes_folder_id = await resolve_path_to_id([year, group_name, subject, "Notes"])
     if not notes_folder_id:
         await placeholder_message.edit_text("❌ Notes folder not found\\.", parse_mode='MarkdownV2')
         return
     
-    service = get_drive_service()
     query = f"'{notes_folder_id}' in parents and trashed = false and (name ~* '(unit|note)_?{note_number}[^0-9]')"
-    response = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-    files = response.get('files', [])
+    response = await _adrive_list({'q': query, 'spaces': 'drive', 'fields': 'files(id, name, size)', 'pageSize': 1})
+    files = response.get('files', []) if response else []
     
     if not files:
         await placeholder_message.edit_text("❌ Note not found\\.", parse_mode='MarkdownV2')
@@ -502,13 +902,14 @@ async def get_note(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     file_to_send = files[0]
     file_id, file_name = file_to_send['id'], file_to_send['name']
-    
-    file_content = await download_file_from_drive(file_id)
+
+    file_content = await download_file_from_drive(file_id, size=int(file_to_send.get('size', 0)))
     if file_content:
         sent_message = await context.bot.send_document(chat_id=update.effective_chat.id, document=file_content, filename=file_name)
-        cache_note_id(year, group_name, subject, note_number, sent_message.document.file_id)
+        await acache_note_id(year, group_name, subject, note_number, sent_message.document.file_id, file_id, file_name)
         await placeholder_message.delete()
     else:
+        evict_path_ids([year, group_name, subject, "Notes"])
         await placeholder_message.edit_text("⚠️ Error downloading the file from Google Drive\\.", parse_mode='MarkdownV2')
 
 async def suggestion(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -523,6 +924,20 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     )
     return ConversationHandler.END
 
+def _checkpoint_wal_sync():
+    with _DB_LOCK:
+        _connect().execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+async def checkpoint_wal(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Periodically checkpoints the WAL so it never grows unbounded.
+
+    PASSIVE copies what it can without waiting on readers or writers, so the
+    job never contends with an in-flight command; the raised autocheckpoint
+    threshold keeps commands from checkpointing inline in the meantime. Runs
+    in a worker thread because _DB_LOCK may be held across a commit's fsync.
+    """
+    await asyncio.to_thread(_checkpoint_wal_sync)
+
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.error("Exception while handling an update:", exc_info=context.error)
     if isinstance(context.error, TimedOut):
@@ -530,7 +945,7 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
             await update.message.reply_text("We're experiencing a delay. Please try your request again in a moment.")
         return
     if isinstance(context.error, TelegramError):
-        logger.warning(f"Telegram API Error: {context.error.message}")
+        logger.warning("Telegram API Error: %s", context.error.message)
         return
 
 # --- Main Bot Execution ---
@@ -543,8 +958,10 @@ def main():
     application = (
         Application.builder()
         .token(TELEGRAM_BOT_TOKEN)
-        .connect_timeout(30)
-        .read_timeout(30)
+        # A larger pool lets concurrent handlers talk to the Bot API over
+        # parallel keep-alive sockets instead of queueing on one connection.
+        .request(HTTPXRequest(connection_pool_size=20, connect_timeout=30, read_timeout=30))
+        .concurrent_updates(32)
         .build()
     )
 
@@ -559,10 +976,12 @@ def main():
                 CommandHandler("branches", list_branches_or_divisions),
                 CommandHandler("divisions", list_branches_or_divisions),
                 CommandHandler("subjects", list_subjects),
-                CommandHandler("assignments", list_assignments),
-                CommandHandler("get", get_assignment),
-                CommandHandler("notes", list_notes),
-                CommandHandler("getnote", get_note),
+                # Drive-heavy commands run as independent tasks so one slow
+                # download never holds up the rest of the conversation state.
+                CommandHandler("assignments", list_assignments, block=False),
+                CommandHandler("get", get_assignment, block=False),
+                CommandHandler("notes", list_notes, block=False),
+                CommandHandler("getnote", get_note, block=False),
                 CommandHandler("suggestion", suggestion),
             ],
         },
@@ -573,6 +992,7 @@ def main():
 
     application.add_handler(conv_handler)
     application.add_error_handler(error_handler)
+    application.job_queue.run_repeating(checkpoint_wal, interval=300, first=300)
     
     logger.info("Bot is starting...")
     application.run_polling()